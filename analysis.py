@@ -1,5 +1,5 @@
-import pandas as pd
-from pricer import BlackScholesPricer
+import numpy as np
+from pricer import BlackScholesPricer, black_scholes_vectorized
 
 def scenario_analysis(pricer, stock_price_scenarios):
      """
@@ -12,6 +12,8 @@ def scenario_analysis(pricer, stock_price_scenarios):
     Returns:
         A pandas DataFrame with the analysis results.
     """
+     import pandas as pd
+
      results = []
      initial_price = pricer.price()
 
@@ -59,4 +61,162 @@ def implied_volatility(market_price, S, K, T, r, option_type, initial_guess=0.5,
         # The Newton-Raphson formula: New Guess = Old Guess - (Error / Derivative)
         sigma = sigma - (price_diff / vega)
 
-    return sigma
\ No newline at end of file
+    return sigma
+
+
+def implied_volatility_vectorized(market_price, S, K, T, r, is_call, tolerance=1e-6, max_iterations=100):
+    """
+    Calculates implied volatilities for arrays of options at once.
+
+    Uses Newton-Raphson like implied_volatility(), but keeps a bracket around
+    the root and falls back to bisection when a Newton step leaves it or vega
+    vanishes. The upper end of the bracket is doubled until it prices above
+    the market, so there is no cap on the volatility found. Prices outside
+    the no-arbitrage bounds, and options that have not converged after
+    max_iterations, give NaN.
+    """
+    market_price, S, K, T, r, is_call = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (market_price, S, K, T, r)), np.asarray(is_call, dtype=bool)
+    )
+    # Work on flat arrays so scalars and N-d inputs share the masking logic
+    shape = market_price.shape
+    market_price, S, K, T, r, is_call = (np.ravel(x) for x in (market_price, S, K, T, r, is_call))
+
+    discounted_strike = K * np.exp(-r * T)
+    lower_bound = np.where(is_call, np.maximum(S - discounted_strike, 0), np.maximum(discounted_strike - S, 0))
+    upper_bound = np.where(is_call, S, discounted_strike)
+    attainable = (market_price > lower_bound) & (market_price < upper_bound) & (T > 0)
+
+    low = np.full(market_price.shape, 1e-4)
+    high = np.full(market_price.shape, 5.0)
+
+    # Widen the bracket until it contains the root. The price tends to the
+    # upper bound as volatility grows, so every attainable price is reached.
+    unbracketed = attainable.copy()
+    for i in range(max_iterations):
+        if not unbracketed.any():
+            break
+        price_at_high = black_scholes_vectorized(
+            S[unbracketed], K[unbracketed], T[unbracketed], r[unbracketed], high[unbracketed],
+            is_call[unbracketed], greeks=False
+        )['price']
+        below = price_at_high < market_price[unbracketed]
+        low[unbracketed] = np.where(below, high[unbracketed], low[unbracketed])
+        high[unbracketed] = np.where(below, high[unbracketed] * 2, high[unbracketed])
+        unbracketed[unbracketed] = below
+
+    sigma = np.where((low < 0.5) & (0.5 < high), 0.5, (low + high) / 2)
+    active = attainable & ~unbracketed
+
+    for i in range(max_iterations):
+        if not active.any():
+            break
+
+        values = black_scholes_vectorized(S[active], K[active], T[active], r[active], sigma[active], is_call[active])
+        price_diff = values['price'] - market_price[active]
+        vega = values['vega']
+
+        converged = np.abs(price_diff) < tolerance
+        current = sigma[active]
+
+        # The price increases with volatility, so the sign of the error moves the bracket
+        low[active] = np.where(price_diff < 0, current, low[active])
+        high[active] = np.where(price_diff > 0, current, high[active])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = current - price_diff / vega
+        bisection = (low[active] + high[active]) / 2
+        in_bracket = (vega > 1e-8) & (newton > low[active]) & (newton < high[active])
+        sigma[active] = np.where(converged, current, np.where(in_bracket, newton, bisection))
+
+        still_active = active.copy()
+        still_active[active] = ~converged
+        active = still_active
+
+    # Anything still active ran out of iterations without converging
+    solved = attainable & ~unbracketed & ~active
+    return np.where(solved, sigma, np.nan).reshape(shape)[()]
+
+
+def portfolio_pnl_surface(book, market_data, r, spot_shocks, days_forward, vol_shift=0.0,
+                          ticker_scales=None, max_chunk_elements=4_000_000):
+    """
+    Calculates aggregate portfolio P&L over a grid of spot moves x days forward.
+
+    Every position is revalued at each grid point in one broadcast
+    evaluation (positions x shocks x days, in chunks of positions) and the
+    P&L against today's value is summed. Identical contracts are merged
+    first, so only distinct contracts are priced.
+
+    Args:
+        book: A position_book.PositionBook.
+        market_data: Dictionary of ticker -> {'price', 'volatility'}.
+        r: Risk-free rate.
+        spot_shocks: Relative underlying moves (0.1 = +10%).
+        days_forward: Calendar days to roll each option forward.
+        vol_shift: Absolute change applied to every volatility (0.05 = +5 vol points).
+        ticker_scales: Optional ticker -> multiplier of the shared shock
+            (e.g. a beta); tickers not listed move with the shared shock.
+
+    Returns:
+        An array of shape (len(days_forward), len(spot_shocks)) with the
+        total P&L, and the list of tickers skipped for lack of market data.
+    """
+    spot_shocks = np.asarray(spot_shocks, dtype=np.float64)
+    days_forward = np.asarray(days_forward, dtype=np.float64)
+    surface = np.zeros((len(days_forward), len(spot_shocks)))
+    ticker_scales = ticker_scales or {}
+
+    priced = np.array([t in market_data for t in book.tickers], dtype=bool)
+    skipped = [t for t, ok in zip(book.tickers, priced) if not ok]
+    if not len(book) or not priced.any():
+        return surface, skipped
+
+    spot = np.array([float(market_data[t]['price']) if t in market_data else np.nan for t in book.tickers])
+    vol = np.array([float(market_data[t]['volatility']) if t in market_data else np.nan for t in book.tickers])
+    scale = np.array([float(ticker_scales.get(t, 1.0)) for t in book.tickers])
+
+    codes = book.ticker_code
+    keep = priced[codes]
+    T = book.time_to_expiration()
+
+    # Merge positions in the same contract so each is priced once
+    keys = np.stack([codes, book.type_code, np.nan_to_num(book.strike), T])[:, keep]
+    contracts, inverse = np.unique(keys, axis=1, return_inverse=True)
+    quantity = np.bincount(inverse.ravel(), weights=book.quantity[keep], minlength=contracts.shape[1])
+    codes, type_code, strike, T = contracts[0].astype(np.int64), contracts[1], contracts[2], contracts[3]
+
+    S0 = spot[codes]
+    # Shocked spots: contracts x shocks, floored to stay positive
+    S = np.maximum(S0[:, None] * (1 + scale[codes][:, None] * spot_shocks[None, :]), 1e-8)
+
+    is_stock = type_code == 0
+    surface += (quantity[is_stock, None] * (S[is_stock] - S0[is_stock, None])).sum(axis=0)[None, :]
+
+    options = np.flatnonzero(~is_stock)
+    if len(options) == 0:
+        return surface, skipped
+
+    sigma0 = vol[codes]
+    is_call = type_code == 1
+    base = np.zeros(len(S0))
+    base[options] = black_scholes_vectorized(
+        S0[options], strike[options], T[options], r, sigma0[options], is_call[options], greeks=False
+    )['price']
+    shocked_sigma = np.maximum(sigma0 + vol_shift, 1e-4)
+
+    chunk_size = max(1, max_chunk_elements // (len(spot_shocks) * len(days_forward)))
+    for start in range(0, len(options), chunk_size):
+        idx = options[start:start + chunk_size]
+        values = black_scholes_vectorized(
+            S[idx][:, None, :],
+            strike[idx, None, None],
+            T[idx, None, None] - days_forward[None, :, None] / 365.25,
+            r,
+            shocked_sigma[idx, None, None],
+            is_call[idx, None, None],
+            greeks=False
+        )['price']
+        surface += np.einsum('i,ids->ds', quantity[idx], values - base[idx, None, None])
+
+    return surface, skipped
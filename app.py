@@ -1,23 +1,42 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 import numpy as np
 from main import run_calculations, get_live_market_data
-from analysis import scenario_analysis, implied_volatility
+from analysis import scenario_analysis, implied_volatility, portfolio_pnl_surface
 from pricer import BlackScholesPricer
 from datetime import date, timedelta
 from database import (
     setup_database,
     get_portfolios,
     create_portfolio,
-    get_positions_for_portfolio,
     add_position
 )
+from position_book import get_position_book
 
-# Initialize database
+# Initialize database (a no-op after the first run in this process)
 setup_database()
 
+
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_market_data(ticker):
+    return get_live_market_data(ticker)
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_risk_free_rate(maturity_days):
+    from main import get_risk_free_rate
+    return get_risk_free_rate(maturity_days=maturity_days)
+
+
+# Keyed on the book's version, so the surface is recomputed only when the
+# positions, market inputs or grid change. The book itself is not hashed.
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_stress_surface(portfolio_id, book_version, _book, market_items, r, max_move, n_moves, n_days, vol_shift, scale_items):
+    spot_shocks = np.linspace(-max_move, max_move, n_moves)
+    days_forward = np.arange(n_days)
+    market = {ticker: {'price': price, 'volatility': vol} for ticker, price, vol in market_items}
+    surface, _ = portfolio_pnl_surface(_book, market, r, spot_shocks, days_forward, vol_shift, dict(scale_items))
+    return spot_shocks, days_forward, surface
+
 # Set up the page
 st.set_page_config(
     page_title="Black-Scholes Calculator",
@@ -292,6 +311,8 @@ with tab1:
             scenario_df = scenario_analysis(pricer, price_range)
 
             # Create an interactive Plotly chart
+            import plotly.express as px
+
             fig = px.line(
                 scenario_df,
                 x='Stock Price',
@@ -378,15 +399,77 @@ with tab2:
 
             # --- Display Current Positions ---
             st.subheader(f"Positions in '{selected_portfolio_name}'")
-            positions = get_positions_for_portfolio(selected_portfolio['id'])
-
-            if positions:
-                positions_df = pd.DataFrame(positions)
-                # Only drop columns if they exist
-                columns_to_drop = [col for col in ['id', 'portfolio_id'] if col in positions_df.columns]
-                if columns_to_drop:
-                    positions_df = positions_df.drop(columns=columns_to_drop)
+            position_book = get_position_book(selected_portfolio['id'])
+
+            if len(position_book):
+                positions_df = position_book.to_frame().reset_index(drop=True)
                 st.dataframe(positions_df, use_container_width=True)
+
+                # --- Portfolio Stress Surface ---
+                st.subheader("🌡️ Portfolio Stress Surface")
+                st.write("Aggregate P&L of every position across underlying moves and days forward.")
+
+                s1, s2, s3, s4 = st.columns(4)
+                with s1:
+                    max_move = st.slider("Max underlying move (%)", 5, 50, 25) / 100
+                with s2:
+                    n_moves = st.slider("Spot grid points", 11, 201, 101, step=10)
+                with s3:
+                    n_days = st.slider("Days forward", 1, 120, 60)
+                with s4:
+                    vol_shift = st.slider("Volatility shift (vol points)", -20, 20, 0) / 100
+
+                shock_mode = st.radio("Underlying moves", ["Shared % shock", "Per-ticker scaling"], horizontal=True)
+                ticker_scales = {}
+                if shock_mode == "Per-ticker scaling":
+                    st.caption("Each ticker moves by its multiplier times the shared shock (e.g. its beta).")
+                    scale_cols = st.columns(min(4, len(position_book.tickers)))
+                    for i, ticker in enumerate(position_book.tickers):
+                        with scale_cols[i % len(scale_cols)]:
+                            ticker_scales[ticker] = st.number_input(f"{ticker} multiplier", value=1.0, step=0.1, key=f"scale_{ticker}")
+
+                market_items = []
+                failed_tickers = []
+                with st.spinner("Fetching market data for portfolio tickers..."):
+                    for ticker in position_book.tickers:
+                        try:
+                            data = cached_market_data(ticker)
+                            market_items.append((ticker, float(data['price']), float(data['volatility'])))
+                        except Exception:
+                            failed_tickers.append(ticker)
+                    try:
+                        portfolio_rate = cached_risk_free_rate(365)
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not fetch live risk-free rate. Using default 5%. Error: {str(e)}")
+                        portfolio_rate = 0.05
+
+                if failed_tickers:
+                    st.warning(f"⚠️ No market data for {', '.join(failed_tickers)}; those positions are left out.")
+
+                if market_items:
+                    spot_shocks, days_forward, surface = cached_stress_surface(
+                        selected_portfolio['id'], position_book.version, position_book,
+                        tuple(market_items), float(portfolio_rate), max_move, n_moves, n_days,
+                        vol_shift, tuple(sorted(ticker_scales.items()))
+                    )
+
+                    import plotly.graph_objects as go
+
+                    fig = go.Figure(go.Heatmap(
+                        x=spot_shocks * 100,
+                        y=days_forward,
+                        z=surface,
+                        colorscale='RdYlGn',
+                        zmid=0,
+                        colorbar={'title': 'P&L ($)'},
+                        hovertemplate="Move: %{x:.1f}%<br>Days forward: %{y}<br>P&L: $%{z:,.2f}<extra></extra>"
+                    ))
+                    fig.update_layout(
+                        title='Portfolio P&L: Underlying Move × Days Forward',
+                        xaxis_title='Underlying Move (%)',
+                        yaxis_title='Days Forward'
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("This portfolio has no positions yet. Add one using the form above.")
 
@@ -0,0 +1,250 @@
+"""
+Columnar archive for old rows of calculated_prices.
+
+Rows older than a retention window are moved out of SQLite into
+zstd-compressed Parquet files partitioned by month
+(archive/calculated_prices/month=YYYY-MM/part-<first id>-<last id>.parquet)
+and sorted by option, so row-group statistics let readers skip data.
+query_calculated_prices reads the archive (memory-mapped) and the live table
+together with the same filters.
+
+Writing or reading archived rows requires pyarrow.
+"""
+import json
+import os
+import sqlite3
+from datetime import date, timedelta
+import database
+from database import setup_database, timestamp_upper_bound
+
+ARCHIVE_DIR = os.path.join('archive', 'calculated_prices')
+RETENTION_DAYS = 90
+ROW_GROUP_SIZE = 64_000
+
+COLUMNS = [
+    'id', 'option_id', 'calculation_timestamp', 'theoretical_price', 'underlying_price',
+    'delta', 'gamma', 'vega', 'theta', 'rho', 'volatility', 'risk_free_rate', 'as_of_date'
+]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The calculated_prices archive requires pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+
+def _archive_schema(pa):
+    types = {
+        'id': pa.int64(),
+        'option_id': pa.int64(),
+        'calculation_timestamp': pa.string(),
+        'as_of_date': pa.string(),
+    }
+    return pa.schema([(name, types.get(name, pa.float64())) for name in COLUMNS])
+
+
+def archive_calculated_prices(retention_days=RETENTION_DAYS, archive_dir=ARCHIVE_DIR, vacuum=True):
+    """
+    Moves rows older than the retention window into the Parquet archive.
+
+    Each month is written to its own file, renamed into place once complete,
+    and then deleted from SQLite in one transaction. Rows whose id is already
+    in the month's partition (left behind by a run interrupted between the
+    two steps) are not written again.
+
+    Args:
+        retention_days: Rows newer than this many days stay in SQLite.
+        archive_dir: Root directory of the archive.
+        vacuum: Whether to VACUUM afterwards to shrink the database file.
+
+    Returns:
+        The number of rows archived.
+    """
+    import pandas as pd
+
+    pa = _import_pyarrow()
+    setup_database()
+
+    cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+    schema = _archive_schema(pa)
+    archived = 0
+
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(calculation_timestamp, 1, 7) FROM calculated_prices WHERE calculation_timestamp < ?",
+            (cutoff,)
+        )]
+
+        for month in months:
+            rows = pd.read_sql_query(
+                f"""SELECT {', '.join(COLUMNS)} FROM calculated_prices
+                    WHERE calculation_timestamp < ? AND substr(calculation_timestamp, 1, 7) = ?
+                    ORDER BY option_id, calculation_timestamp""",
+                conn, params=(cutoff, month)
+            )
+            if rows.empty:
+                continue
+
+            last_id = int(rows['id'].max())
+            partition = os.path.join(archive_dir, f"month={month}")
+            os.makedirs(partition, exist_ok=True)
+            new_rows = rows[~rows['id'].isin(_archived_ids(pa, partition))]
+            if not new_rows.empty:
+                first_id, new_last_id = int(new_rows['id'].min()), int(new_rows['id'].max())
+                name = f"part-{first_id}-{new_last_id}.parquet"
+                # Written under a hidden name (skipped by readers) and renamed
+                # into place, so a failed write never leaves a partial part file
+                temporary = os.path.join(partition, f".{name}.tmp")
+                pa.parquet.write_table(
+                    pa.Table.from_pandas(new_rows, schema=schema, preserve_index=False),
+                    temporary,
+                    compression='zstd',
+                    row_group_size=ROW_GROUP_SIZE
+                )
+                os.replace(temporary, os.path.join(partition, name))
+
+            with conn:
+                conn.execute(
+                    """DELETE FROM calculated_prices
+                       WHERE calculation_timestamp < ? AND substr(calculation_timestamp, 1, 7) = ? AND id <= ?""",
+                    (cutoff, month, last_id)
+                )
+            archived += len(rows)
+            print(f"  > Archived {len(rows)} rows for {month}")
+
+        if vacuum and archived:
+            conn.execute("VACUUM")
+    except sqlite3.Error as e:
+        print(f"Error archiving calculations: {e}")
+    finally:
+        conn.close()
+
+    print(f"Archived {archived} calculation results older than {cutoff}.")
+    return archived
+
+
+def _archived_ids(pa, partition):
+    """The ids already written to one month's partition."""
+    files = [os.path.join(partition, name) for name in os.listdir(partition) if name.endswith('.parquet')]
+    if not files:
+        return []
+    return pa.dataset.dataset(files, format='parquet').to_table(columns=['id']).column('id').to_pylist()
+
+
+def _open_archive(pa, archive_dir):
+    from pyarrow import fs
+
+    # An explicit schema keeps columns resolvable even if a partition is empty
+    return pa.dataset.dataset(
+        archive_dir,
+        schema=_archive_schema(pa).append(pa.field('month', pa.string())),
+        format='parquet',
+        partitioning=pa.dataset.partitioning(pa.schema([('month', pa.string())]), flavor='hive'),
+        filesystem=fs.LocalFileSystem(use_mmap=True)
+    )
+
+
+def has_archived_backfill(option_ids, start_date, end_date, archive_dir=ARCHIVE_DIR):
+    """Whether the archive holds backfilled results for these options between two as-of dates."""
+    if not os.path.isdir(archive_dir):
+        return False
+
+    pa = _import_pyarrow()
+    import pyarrow.compute as pc
+
+    start_date, end_date = str(start_date), str(end_date)
+    condition = (
+        (pc.field('month') >= start_date[:7]) & (pc.field('month') <= end_date[:7])
+        & (pc.field('as_of_date') >= start_date) & (pc.field('as_of_date') <= end_date)
+        & pc.field('option_id').isin([int(i) for i in option_ids])
+    )
+    return _open_archive(pa, archive_dir).count_rows(filter=condition) > 0
+
+
+def _read_archive(pa, archive_dir, option_ids, start, end, columns):
+    import pyarrow.compute as pc
+
+    dataset = _open_archive(pa, archive_dir)
+
+    # Month bounds prune whole partitions; the rest is checked against
+    # row-group statistics before any data is decoded.
+    conditions = []
+    if option_ids is not None:
+        conditions.append(pc.field('option_id').isin([int(i) for i in option_ids]))
+    if start is not None:
+        conditions.append(pc.field('month') >= str(start)[:7])
+        conditions.append(pc.field('calculation_timestamp') >= str(start))
+    if end is not None:
+        conditions.append(pc.field('month') <= str(end)[:7])
+        conditions.append(pc.field('calculation_timestamp') <= timestamp_upper_bound(end))
+
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def query_calculated_prices(option_ids=None, start=None, end=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    Reads calculation results across the archive and the live table.
+
+    Args:
+        option_ids: Restrict to these options.
+        start, end: Inclusive bounds on calculation_timestamp. A date-only
+            end includes every result on that date.
+        columns: Columns to return (all by default).
+        archive_dir: Root directory of the archive.
+
+    Returns:
+        A pandas DataFrame sorted by option_id, calculation_timestamp and id.
+    """
+    import pandas as pd
+
+    setup_database()
+
+    columns = list(columns or COLUMNS)
+    sort_columns = [c for c in ('option_id', 'calculation_timestamp', 'id') if c in columns]
+
+    # Without an archive on disk this is a plain SQLite query and needs no pyarrow
+    archived = None
+    if os.path.isdir(archive_dir):
+        archived = _read_archive(_import_pyarrow(), archive_dir, option_ids, start, end, columns)
+
+    where, params = [], []
+    if option_ids is not None:
+        where.append("option_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(i) for i in option_ids]))
+    if start is not None:
+        where.append("calculation_timestamp >= ?")
+        params.append(str(start))
+    if end is not None:
+        where.append("calculation_timestamp <= ?")
+        params.append(timestamp_upper_bound(end))
+
+    sql = f"SELECT {', '.join(columns)} FROM calculated_prices"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        live = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+    frames = [f for f in (archived, live) if f is not None and not f.empty]
+    if not frames:
+        return live
+    result = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return result.sort_values(sort_columns, ignore_index=True) if sort_columns else result
+
+
+if __name__ == '__main__':
+    import sys
+
+    archive_calculated_prices(int(sys.argv[1]) if len(sys.argv) > 1 else RETENTION_DAYS)
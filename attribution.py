@@ -0,0 +1,116 @@
+import sqlite3
+import database
+from database import setup_database
+from archive import query_calculated_prices
+
+COMPONENTS = ['delta_pnl', 'gamma_pnl', 'vega_pnl', 'theta_pnl', 'residual_pnl']
+
+_HISTORY_COLUMNS = [
+    'id', 'option_id', 'calculation_timestamp', 'theoretical_price', 'underlying_price',
+    'volatility', 'delta', 'gamma', 'vega', 'theta'
+]
+# Values of the previous run carried onto each step
+_PREVIOUS = {
+    'calculation_timestamp': 'prev_timestamp',
+    'theoretical_price': 'prev_price',
+    'underlying_price': 'prev_underlying_price',
+    'volatility': 'prev_volatility',
+    'delta': 'prev_delta',
+    'gamma': 'prev_gamma',
+    'vega': 'prev_vega',
+    'theta': 'prev_theta',
+}
+
+# Positions are matched to contracts on the unique contract key
+_PORTFOLIO_OPTIONS = """
+    SELECT o.id AS option_id, SUM(p.quantity) AS quantity
+    FROM positions AS p
+    JOIN options_data AS o
+      ON o.ticker = p.ticker
+     AND o.option_type = p.asset_type
+     AND o.strike_price = p.strike_price
+     AND o.expiration_date = p.expiration_date
+    WHERE p.portfolio_id = ?
+    GROUP BY o.id
+"""
+
+
+def explain_pnl_steps(start='0000-01-01', end='9999-12-31', option_ids=None, portfolio_id=None):
+    """
+    Breaks the change in price between consecutive stored runs into Greeks.
+
+    Each step uses the Greeks of the earlier run: delta * dS,
+    0.5 * gamma * dS^2, vega * d(sigma) and theta * dt. Whatever the Taylor
+    expansion does not explain is reported as residual. Results for a
+    portfolio are scaled by position quantity.
+
+    Args:
+        start, end: Timestamps bounding the runs to include (inclusive). A
+            date-only end includes every run on that date.
+        option_ids: Restrict to these options.
+        portfolio_id: Restrict to the option positions of this portfolio.
+
+    Returns:
+        A pandas DataFrame with one row per option and step.
+    """
+    import pandas as pd
+
+    setup_database()
+
+    quantities = None
+    if portfolio_id is not None:
+        conn = sqlite3.connect(database.DB_NAME)
+        try:
+            quantities = dict(conn.execute(_PORTFOLIO_OPTIONS, (portfolio_id,)).fetchall())
+        except sqlite3.Error as e:
+            print(f"Error fetching portfolio positions: {e}")
+            quantities = {}
+        finally:
+            conn.close()
+        option_ids = list(quantities)
+
+    # Reads archived and live results alike, sorted by option and time
+    try:
+        history = query_calculated_prices(option_ids, start, end, columns=_HISTORY_COLUMNS)
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        print(f"Error fetching price history: {e}")
+        return pd.DataFrame(columns=['option_id', 'calculation_timestamp', 'total_pnl'] + COMPONENTS)
+
+    previous = history.groupby('option_id')[list(_PREVIOUS)].shift(1).rename(columns=_PREVIOUS)
+    steps = pd.concat([history, previous], axis=1)
+    steps = steps[steps['prev_timestamp'].notna()].reset_index(drop=True)
+
+    steps['quantity'] = 1 if quantities is None else steps['option_id'].map(quantities)
+    elapsed = pd.to_datetime(steps['calculation_timestamp']) - pd.to_datetime(steps['prev_timestamp'])
+    steps['elapsed_years'] = elapsed.dt.total_seconds() / 86400 / 365.25
+
+    quantity = steps['quantity']
+    spot_move = steps['underlying_price'] - steps['prev_underlying_price']
+    # Results saved before volatility was stored leave the vega term in residual
+    vol_move = (steps['volatility'] - steps['prev_volatility']).fillna(0.0)
+
+    steps['total_pnl'] = quantity * (steps['theoretical_price'] - steps['prev_price'])
+    steps['delta_pnl'] = quantity * steps['prev_delta'].fillna(0.0) * spot_move
+    steps['gamma_pnl'] = quantity * 0.5 * steps['prev_gamma'].fillna(0.0) * spot_move**2
+    steps['vega_pnl'] = quantity * steps['prev_vega'].fillna(0.0) * vol_move
+    steps['theta_pnl'] = quantity * steps['prev_theta'].fillna(0.0) * steps['elapsed_years']
+    steps['residual_pnl'] = steps['total_pnl'] - steps[COMPONENTS[:-1]].sum(axis=1)
+
+    return steps
+
+
+def explain_pnl(start='0000-01-01', end='9999-12-31', option_ids=None, portfolio_id=None):
+    """
+    Explains P&L between two runs for each option, summing the daily steps.
+
+    Takes the same arguments as explain_pnl_steps(). The portfolio total is
+    the column sum of the result.
+
+    Returns:
+        A pandas DataFrame indexed by option_id with the total P&L and its
+        delta, gamma, vega, theta and residual components.
+    """
+    steps = explain_pnl_steps(start, end, option_ids, portfolio_id)
+    summary = steps.groupby('option_id')[['total_pnl'] + COMPONENTS].sum()
+    summary['steps'] = steps.groupby('option_id').size()
+    return summary
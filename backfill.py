@@ -0,0 +1,192 @@
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from pricer import black_scholes_vectorized
+from database import (
+    setup_database,
+    get_all_options,
+    replace_backfilled_results
+)
+from market_data import get_coordinator
+from archive import has_archived_backfill
+
+# Trading days used for the rolling volatility, matching get_live_market_data
+VOLATILITY_WINDOW = 252
+MIN_VOLATILITY_OBSERVATIONS = 20
+
+# Rate ticker used by run_calculations for its single risk-free rate
+RATE_TICKER = "^TNX"
+
+CHUNK_SIZE = 2_000
+
+# Backfilled results are stamped at the US market close (in UTC, like
+# CURRENT_TIMESTAMP) so they sort after live runs of the same day.
+CLOSE_TIME = '21:00:00'
+
+
+def _load_closes(tickers, start, end):
+    """Loads daily closes for every ticker once, as one dates x tickers frame."""
+    import pandas as pd
+
+    coordinator = get_coordinator()
+    columns = {}
+    for ticker in tickers:
+        try:
+            hist = coordinator.history(ticker, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat())
+        except Exception as e:
+            print(f"Could not load history for {ticker}. Error: {e}. Skipping.")
+            continue
+        if hist.empty:
+            print(f"No history for {ticker}. Skipping.")
+            continue
+
+        closes = hist['Close']
+        index = pd.DatetimeIndex(closes.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        columns[ticker] = pd.Series(closes.to_numpy(), index=index.normalize())
+
+    return pd.DataFrame(columns).sort_index()
+
+
+def run_backfill(start_date, end_date, option_ids=None, r=None, chunk_size=CHUNK_SIZE):
+    """
+    Reprices the option book for every trading day between two dates.
+
+    Underlying closes for all tickers are loaded once. Each day uses the
+    close as the spot, the trailing 252-day historical volatility, the
+    time to expiration from that day and (unless `r` is given) that day's
+    ^TNX yield. Prices and Greeks for all options x dates are computed in
+    vectorized chunks and bulk-written to calculated_prices with their
+    as_of_date. Re-running a range replaces its earlier backfill in the same
+    transaction; ranges whose backfill has been archived are refused.
+
+    Args:
+        start_date, end_date: First and last as-of dates (date or YYYY-MM-DD).
+        option_ids: Restrict the backfill to these options.
+        r: Constant risk-free rate to use instead of the ^TNX history.
+        chunk_size: Options priced per vectorized chunk.
+
+    Returns:
+        The number of results written.
+    """
+    setup_database()
+    start_time = time.perf_counter()
+
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+
+    options = get_all_options()
+    if option_ids is not None:
+        wanted = set(option_ids)
+        options = [o for o in options if o['id'] in wanted]
+    if not options:
+        print("No options to backfill.")
+        return 0
+
+    # Archived results can no longer be replaced, so a re-run would duplicate them
+    if has_archived_backfill([o['id'] for o in options], start_date, end_date):
+        print(f"Backfilled results between {start_date} and {end_date} have already been archived; "
+              f"backfill only dates after the archive window.")
+        return 0
+
+    # Extra history before the start feeds the first rolling volatility window
+    history_start = start_date - timedelta(days=int(VOLATILITY_WINDOW * 1.6))
+    tickers = sorted({o['ticker'] for o in options})
+    print(f"Loading closes for {len(tickers)} tickers from {history_start} to {end_date}...")
+    closes = _load_closes(tickers + ([] if r is not None else [RATE_TICKER]), history_start, end_date)
+
+    if r is None:
+        if RATE_TICKER not in closes:
+            print(f"No {RATE_TICKER} history available; pass a constant rate instead.")
+            return 0
+        rates = closes.pop(RATE_TICKER).ffill() / 100
+    tickers = [t for t in tickers if t in closes]
+    closes = closes[tickers].dropna(how='all')
+
+    log_returns = np.log(closes / closes.shift(1))
+    volatility = log_returns.rolling(VOLATILITY_WINDOW, min_periods=MIN_VOLATILITY_OBSERVATIONS).std() * np.sqrt(252)
+
+    in_range = (closes.index >= str(start_date)) & (closes.index <= str(end_date))
+    dates = closes.index[in_range]
+    spot_grid = closes.to_numpy().T[:, in_range]
+    vol_grid = volatility.to_numpy().T[:, in_range]
+    rate_row = np.full(len(dates), r, dtype=np.float64) if r is not None else rates.reindex(dates).ffill().to_numpy()
+
+    date_days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    date_strings = dates.strftime('%Y-%m-%d').to_numpy()
+    timestamps = np.array([f"{d} {CLOSE_TIME}" for d in date_strings])
+
+    options = [o for o in options if o['ticker'] in closes]
+    ticker_codes = {t: i for i, t in enumerate(tickers)}
+    ids = np.array([o['id'] for o in options])
+    codes = np.array([ticker_codes[o['ticker']] for o in options])
+    K = np.array([o['strike_price'] for o in options], dtype=np.float64)
+    is_call = np.array([o['option_type'].lower() == 'call' for o in options])
+    expiry_days = np.array(
+        [datetime.strptime(o['expiration_date'], '%Y-%m-%d').date() for o in options], dtype='datetime64[D]'
+    ).astype(np.int64)
+
+    print(f"Backfilling {len(options)} options over {len(dates)} trading days...")
+
+    def result_rows():
+        for start in range(0, len(options), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            S = spot_grid[codes[chunk]]
+            sigma = vol_grid[codes[chunk]]
+            # Same convention as calculate_time_to_expiration: whole days / 365.25
+            T = (expiry_days[chunk, None] - date_days[None, :]) / 365.25
+
+            valid = (
+                (T > 0) & np.isfinite(S) & np.isfinite(sigma) & (sigma > 0)
+                & np.isfinite(rate_row)[None, :] & (K[chunk] > 0)[:, None]
+            )
+            option_index, date_index = np.nonzero(valid)
+            if len(option_index) == 0:
+                continue
+
+            S = S[valid]
+            sigma = sigma[valid]
+            rate = rate_row[date_index]
+            values = black_scholes_vectorized(
+                S, K[chunk][option_index], T[valid], rate, sigma, is_call[chunk][option_index]
+            )
+
+            # theoretical_price is NOT NULL; drop anything the model could not price
+            priced = np.isfinite(values['price'])
+            values = {name: v[priced] for name, v in values.items()}
+            option_index, date_index = option_index[priced], date_index[priced]
+
+            yield from zip(
+                ids[chunk][option_index].tolist(),
+                timestamps[date_index].tolist(),
+                values['price'].tolist(),
+                S[priced].tolist(),
+                values['delta'].tolist(),
+                values['gamma'].tolist(),
+                values['vega'].tolist(),
+                values['theta'].tolist(),
+                values['rho'].tolist(),
+                sigma[priced].tolist(),
+                rate[priced].tolist(),
+                date_strings[date_index].tolist(),
+            )
+
+    # Replacing the range in one transaction keeps the earlier backfill if any write fails
+    written = replace_backfilled_results(ids.tolist(), str(start_date), str(end_date), result_rows())
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Backfill complete: {written} results written in {elapsed:.1f}s.")
+    return written
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python backfill.py <start YYYY-MM-DD> <end YYYY-MM-DD>")
+        sys.exit(1)
+
+    run_backfill(sys.argv[1], sys.argv[2])
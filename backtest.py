@@ -0,0 +1,194 @@
+import numpy as np
+from pricer import black_scholes_vectorized
+from database import get_all_options
+from main import calculate_time_to_expiration
+
+# Upper bound on options x paths x policies x steps held in memory per chunk
+MAX_CHUNK_ELEMENTS = 4_000_000
+
+
+def simulate_gbm_paths(S0, sigma, T, n_steps, n_paths, mu=0.0, seed=None):
+    """
+    Simulates geometric Brownian motion price paths.
+
+    Returns:
+        An array of shape (n_paths, n_steps + 1) whose first column is S0.
+    """
+    rng = np.random.default_rng(seed)
+    dt = T / n_steps
+    shocks = rng.standard_normal((n_paths, n_steps))
+    log_steps = (mu - sigma**2 / 2) * dt + sigma * np.sqrt(dt) * shocks
+
+    log_paths = np.concatenate([np.zeros((n_paths, 1)), np.cumsum(log_steps, axis=1)], axis=1)
+    return S0 * np.exp(log_paths)
+
+
+def historical_paths(closes, n_steps, S0=None, stride=1):
+    """
+    Builds paths from overlapping windows of historical closing prices.
+
+    Each window is rescaled so that it starts at S0 (the last close by
+    default), which replays past returns from today's price level.
+
+    Returns:
+        An array of shape (n_windows, n_steps + 1).
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) <= n_steps:
+        raise ValueError("Price history is shorter than the requested path length.")
+    if S0 is None:
+        S0 = closes[-1]
+
+    windows = np.lib.stride_tricks.sliding_window_view(closes, n_steps + 1)[::stride]
+    return S0 * windows / windows[:, :1]
+
+
+def _hedge_chunk(S, K, T, is_call, h, sigma, r, dt, rebalance_index):
+    """
+    Delta-hedges a short position in each option of a chunk along every path.
+
+    S has shape (paths, steps + 1); K, T, is_call and h (settlement step)
+    have shape (options,). rebalance_index has shape (policies, steps + 1)
+    and maps every step to the step whose delta is held. Everything is
+    discounted to time zero so the self-financing cash account needs no loop.
+
+    Returns:
+        (pnl, costs_per_unit_rate) arrays of shape (options, paths, policies).
+    """
+    n_steps = S.shape[1] - 1
+    steps = np.arange(n_steps + 1)
+    tau = T[:, None] - steps * dt
+
+    values = black_scholes_vectorized(
+        S[None, :, :], K[:, None, None], tau[:, None, :], r, sigma, is_call[:, None, None]
+    )
+    option_value = values['price']
+    delta = values['delta']
+
+    # Hold the delta of the last rebalance date until the option settles
+    held = delta[:, :, rebalance_index]
+    live = steps[None, :] < h[:, None]
+    held = np.where(live[:, None, None, :], held, 0.0)
+
+    trades = np.diff(held, axis=-1, prepend=0.0)
+    discount = np.exp(-r * steps * dt)
+    traded_value = discount * trades * S[None, :, None, :]
+
+    stock_cash = -traded_value.sum(axis=-1)
+    turnover = np.abs(traded_value).sum(axis=-1)
+
+    terminal_value = np.take_along_axis(option_value, h[:, None, None], axis=-1)
+    premium = option_value[:, :, :1]
+    pnl = premium + stock_cash - discount[h][:, None, None] * terminal_value
+
+    return pnl, turnover
+
+
+def _stats(values):
+    return {
+        'mean': values.mean(axis=0),
+        'std': values.std(axis=0),
+        'p05': np.percentile(values, 5, axis=0),
+        'p50': np.percentile(values, 50, axis=0),
+        'p95': np.percentile(values, 95, axis=0),
+    }
+
+
+def run_hedging_backtest(paths, dt, rebalance_every, r, sigma, cost_rate=0.0, options=None, chunk_size=None):
+    """
+    Backtests delta hedging of short option positions over price paths.
+
+    Every option is sold at its model price and hedged with the model delta,
+    rebalanced every `rebalance_every[k]` steps, until expiry or the end of
+    the paths (where the option is marked to model). All options, paths and
+    rebalancing policies are evaluated together, a chunk of options at a time.
+
+    Args:
+        paths: Dictionary of ticker -> array (n_paths, n_steps + 1) of prices.
+            All tickers must share the same shape so book P&L lines up.
+        dt: Time between steps in years (1/252 for daily closes).
+        rebalance_every: List of rebalancing intervals in steps.
+        r: Risk-free rate.
+        sigma: Hedging volatility, either a float or a dictionary per ticker.
+        cost_rate: Proportional transaction cost per unit of traded notional.
+        options: Rows shaped like get_all_options(); defaults to options_data.
+        chunk_size: Options per chunk; sized from MAX_CHUNK_ELEMENTS if None.
+
+    Returns:
+        Two pandas DataFrames: statistics per option and policy, and
+        statistics of the total book P&L per policy.
+    """
+    import pandas as pd
+
+    if options is None:
+        options = get_all_options()
+
+    shapes = {np.shape(p) for p in paths.values()}
+    if len(shapes) != 1:
+        raise ValueError("All tickers must have paths of the same shape.")
+    n_paths, n_points = shapes.pop()
+    n_steps = n_points - 1
+
+    rebalance_every = np.asarray(rebalance_every, dtype=np.int64)
+    rebalance_index = (np.arange(n_steps + 1)[None, :] // rebalance_every[:, None]) * rebalance_every[:, None]
+
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_ELEMENTS // (n_paths * len(rebalance_every) * n_points))
+
+    by_ticker = {}
+    for option in options:
+        if option['ticker'] not in paths:
+            print(f"No price paths for {option['ticker']}. Skipping option ID {option['id']}.")
+            continue
+        by_ticker.setdefault(option['ticker'], []).append(option)
+
+    rows = []
+    book_pnl = np.zeros((n_paths, len(rebalance_every)))
+    book_hedging_error = np.zeros((n_paths, len(rebalance_every)))
+
+    for ticker, ticker_options in by_ticker.items():
+        S = np.asarray(paths[ticker], dtype=np.float64)
+        ticker_sigma = sigma[ticker] if isinstance(sigma, dict) else sigma
+
+        ids = np.array([o['id'] for o in ticker_options])
+        K = np.array([o['strike_price'] for o in ticker_options], dtype=np.float64)
+        T = np.array([calculate_time_to_expiration(o['expiration_date']) for o in ticker_options])
+        is_call = np.array([o['option_type'].lower() == 'call' for o in ticker_options])
+        h = np.minimum(np.ceil(T / dt - 1e-9).astype(np.int64), n_steps)
+
+        for start in range(0, len(ticker_options), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            hedging_error, turnover = _hedge_chunk(
+                S, K[chunk], T[chunk], is_call[chunk], h[chunk],
+                ticker_sigma, r, dt, rebalance_index
+            )
+            costs = cost_rate * turnover
+            pnl = hedging_error - costs
+
+            book_pnl += pnl.sum(axis=0)
+            book_hedging_error += hedging_error.sum(axis=0)
+
+            # Move paths to the front so statistics reduce over axis 0
+            pnl_stats = _stats(np.moveaxis(pnl, 1, 0))
+            mean_costs = costs.mean(axis=1)
+            rms_error = np.sqrt((hedging_error**2).mean(axis=1))
+
+            for i, option_id in enumerate(ids[chunk]):
+                for k, every in enumerate(rebalance_every):
+                    row = {'option_id': int(option_id), 'ticker': ticker, 'rebalance_every': int(every)}
+                    row.update({f'pnl_{name}': stat[i, k] for name, stat in pnl_stats.items()})
+                    row['mean_cost'] = mean_costs[i, k]
+                    row['rms_hedging_error'] = rms_error[i, k]
+                    rows.append(row)
+
+    book_stats = _stats(book_pnl)
+    book_rows = [
+        {
+            'rebalance_every': int(every),
+            **{f'pnl_{name}': stat[k] for name, stat in book_stats.items()},
+            'rms_hedging_error': np.sqrt((book_hedging_error[:, k]**2).mean()),
+        }
+        for k, every in enumerate(rebalance_every)
+    ]
+
+    return pd.DataFrame(rows), pd.DataFrame(book_rows)
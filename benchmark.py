@@ -0,0 +1,234 @@
+"""
+Benchmarks for the pricing tool.
+
+Run with `python benchmark.py`. Each benchmark prints its timings and the
+script exits non-zero if a budget is exceeded, so it can be used as a check.
+"""
+import subprocess
+import sys
+
+# Modules that must not be loaded just by starting the app or the batch pricer.
+HEAVY_MODULES = ['yfinance', 'pandas', 'plotly', 'scipy.stats']
+
+STARTUP_BUDGET_SECONDS = 1.0
+
+_STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import main, analysis, database
+imported = time.perf_counter()
+from pricer import BlackScholesPricer
+BlackScholesPricer(100.0, 100.0, 0.5, 0.05, 0.2, 'call').price()
+priced = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'first_price_seconds': priced - start,
+    'loaded_heavy_modules': [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def benchmark_startup(runs=5):
+    """
+    Measures cold import time and time-to-first-price in fresh interpreters.
+
+    Returns:
+        A dictionary with the best import time, the best time-to-first-price
+        and any heavy modules that were loaded eagerly.
+    """
+    import json
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SCRIPT % HEAVY_MODULES],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        'import_seconds': min(r['import_seconds'] for r in results),
+        'first_price_seconds': min(r['first_price_seconds'] for r in results),
+        'loaded_heavy_modules': sorted({m for r in results for m in r['loaded_heavy_modules']}),
+    }
+
+
+def benchmark_history_scan(n_options=2_000, n_days=250):
+    """
+    Times a full-history scan of calculated_prices before and after archiving.
+
+    Builds a synthetic database in a temporary directory, scans it from
+    SQLite, archives every row and scans again through the archive.
+
+    Returns:
+        A dictionary with scan times and database sizes, or None if pyarrow
+        is not installed.
+    """
+    import os
+    import sqlite3
+    import tempfile
+    import time
+    from datetime import date, timedelta
+    import database
+
+    try:
+        import archive
+        archive._import_pyarrow()
+    except ImportError:
+        return None
+
+    original_db = database.DB_NAME
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, 'bench.db')
+        archive_dir = os.path.join(tmp, 'archive')
+        try:
+            database.setup_database()
+            first_day = date.today() - timedelta(days=n_days + 1)
+            rows = (
+                (option_id, f"{first_day + timedelta(days=day)} 21:00:00", 5.0, 100.0,
+                 0.5, 0.01, 20.0, -5.0, 10.0, 0.25, 0.04, None)
+                for day in range(n_days) for option_id in range(1, n_options + 1)
+            )
+            database.save_calculation_results(rows, batch_size=100_000)
+            size_before = os.path.getsize(database.DB_NAME)
+
+            start = time.perf_counter()
+            conn = sqlite3.connect(database.DB_NAME)
+            conn.execute("SELECT * FROM calculated_prices").fetchall()
+            conn.close()
+            sqlite_scan = time.perf_counter() - start
+
+            archive.archive_calculated_prices(retention_days=0, archive_dir=archive_dir)
+            size_after = os.path.getsize(database.DB_NAME)
+
+            start = time.perf_counter()
+            scanned = len(archive.query_calculated_prices(archive_dir=archive_dir))
+            archive_scan = time.perf_counter() - start
+
+            start = time.perf_counter()
+            archive.query_calculated_prices(option_ids=[1, 2, 3], archive_dir=archive_dir)
+            archive_filtered = time.perf_counter() - start
+        finally:
+            database.DB_NAME = original_db
+
+    return {
+        'rows': scanned,
+        'sqlite_scan_seconds': sqlite_scan,
+        'archive_scan_seconds': archive_scan,
+        'archive_filtered_seconds': archive_filtered,
+        'db_bytes_before': size_before,
+        'db_bytes_after': size_after,
+    }
+
+
+def benchmark_pricing_service(n_requests=5_000, concurrency=64):
+    """
+    Load-tests the pricing service on localhost.
+
+    Starts the service on a free port in a background thread, then runs
+    `concurrency` keep-alive clients sending a mix of price, Greeks and IV
+    requests.
+
+    Returns:
+        A dictionary with throughput, client-side latency percentiles and
+        the service's own statistics.
+    """
+    import asyncio
+    import json
+    import random
+    import threading
+    import time
+    import numpy as np
+    from pricing_service import PricingService
+
+    loop = asyncio.new_event_loop()
+    service = PricingService()
+    server = loop.run_until_complete(service.start('127.0.0.1', 0))
+    port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    latencies = []
+
+    async def client(n):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for _ in range(n):
+            endpoint = random.choice(['price', 'greeks', 'iv'])
+            request = {'S': random.uniform(80, 120), 'K': 100.0, 'T': random.uniform(0.05, 2), 'r': 0.04,
+                       'option_type': random.choice(['call', 'put'])}
+            if endpoint == 'iv':
+                request['market_price'] = random.uniform(5, 15)
+            else:
+                request['sigma'] = random.uniform(0.1, 0.6)
+            body = json.dumps(request).encode()
+
+            start = time.perf_counter()
+            writer.write(f"POST /{endpoint} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            length = 0
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    async def run():
+        await asyncio.gather(*(client(n_requests // concurrency) for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+    stats = service.stats()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'client_latency_ms': {f'p{q}': float(np.percentile(latencies, q)) * 1000 for q in (50, 95, 99)},
+        'service': stats,
+    }
+
+
+def main():
+    failures = []
+
+    print("--- Startup ---")
+    startup = benchmark_startup()
+    print(f"  > Import time: {startup['import_seconds']:.3f}s")
+    print(f"  > Time to first price: {startup['first_price_seconds']:.3f}s")
+    if startup['loaded_heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(startup['loaded_heavy_modules'])}")
+    if startup['first_price_seconds'] > STARTUP_BUDGET_SECONDS:
+        failures.append(f"time to first price above {STARTUP_BUDGET_SECONDS}s budget")
+
+    print("--- Full-history scan of calculated_prices ---")
+    scan = benchmark_history_scan()
+    if scan is None:
+        print("  > Skipped: pyarrow is not installed")
+    else:
+        print(f"  > {scan['rows']} rows")
+        print(f"  > SQLite scan: {scan['sqlite_scan_seconds']:.3f}s")
+        print(f"  > Archive scan: {scan['archive_scan_seconds']:.3f}s "
+              f"(3 options: {scan['archive_filtered_seconds']:.3f}s)")
+        print(f"  > Database size: {scan['db_bytes_before'] / 1e6:.1f} MB -> {scan['db_bytes_after'] / 1e6:.1f} MB")
+
+    print("--- Pricing service load test ---")
+    load = benchmark_pricing_service()
+    latency = load['client_latency_ms']
+    batch_size = load['service']['batch_size']
+    print(f"  > {load['requests']} requests at {load['requests_per_second']:,.0f} req/s")
+    print(f"  > Latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms")
+    print(f"  > {load['service']['batches']} batches, mean size {batch_size['mean']:.1f}, max {batch_size['max']}")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,30 @@
+import json
 import sqlite3
 
 DB_NAME = 'options.db'
 
+# Bump this whenever the schema below changes. It is stored in the database's
+# PRAGMA user_version so existing files are only migrated once.
+SCHEMA_VERSION = 4
+
+# Databases already checked in this process, so Streamlit reruns skip the setup.
+_initialized_databases = set()
+
 
 def setup_database():
+  if DB_NAME in _initialized_databases:
+    return
+
   conn = sqlite3.connect(DB_NAME)
 
   try:
     cursor = conn.cursor()
 
+    current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if current_version >= SCHEMA_VERSION:
+      _initialized_databases.add(DB_NAME)
+      return
+
     cursor.execute("""
 CREATE TABLE IF NOT EXISTS options_data(
                    id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -59,7 +75,55 @@ CREATE TABLE IF NOT EXISTS options_data(
     cursor.execute("INSERT OR IGNORE INTO portfolios (id, name, description) VALUES (?, ?, ?)",
                        (1, 'My First Portfolio', 'A default portfolio for tracking positions.'))
 
+    if current_version < 2:
+      # One row per contract: point price history at the oldest duplicate,
+      # drop the other duplicates and enforce uniqueness from now on.
+      # GROUP BY treats NULL strikes as equal, so the join must as well (IS).
+      cursor.execute("""
+          UPDATE calculated_prices SET option_id = (
+              SELECT MIN(keep.id)
+              FROM options_data AS dup
+              JOIN options_data AS keep
+                ON keep.ticker = dup.ticker
+               AND keep.option_type = dup.option_type
+               AND keep.strike_price IS dup.strike_price
+               AND keep.expiration_date = dup.expiration_date
+              WHERE dup.id = calculated_prices.option_id
+          )
+          WHERE option_id IN (SELECT id FROM options_data);
+      """)
+      cursor.execute("""
+          DELETE FROM options_data WHERE id NOT IN (
+              SELECT MIN(id) FROM options_data
+              GROUP BY ticker, option_type, strike_price, expiration_date
+          );
+      """)
+      cursor.execute("""
+          CREATE UNIQUE INDEX IF NOT EXISTS idx_options_data_contract
+          ON options_data(ticker, option_type, strike_price, expiration_date);
+      """)
+
+    if current_version < 3:
+      # Model inputs are stored with each result so P&L can be explained later
+      cursor.execute("ALTER TABLE calculated_prices ADD COLUMN volatility REAL")
+      cursor.execute("ALTER TABLE calculated_prices ADD COLUMN risk_free_rate REAL")
+      cursor.execute("""
+          CREATE INDEX IF NOT EXISTS idx_calculated_prices_option_time
+          ON calculated_prices(option_id, calculation_timestamp);
+      """)
+
+    if current_version < 4:
+      # Set only on rows written by a historical backfill
+      cursor.execute("ALTER TABLE calculated_prices ADD COLUMN as_of_date TEXT")
+      cursor.execute("""
+          CREATE INDEX IF NOT EXISTS idx_calculated_prices_as_of
+          ON calculated_prices(as_of_date);
+      """)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
     conn.commit()
+    _initialized_databases.add(DB_NAME)
     print("Database setup complete. Table 'options_data' is ready.")
 
 
@@ -75,13 +139,17 @@ CREATE TABLE IF NOT EXISTS options_data(
 def add_option(ticker, option_type, strike_price, expiration_date):
   conn = sqlite3.connect(DB_NAME)
 
-  sql = ''' INSERT INTO options_data(ticker, option_type, strike_price, expiration_date) VALUES(?,?,?,?) '''
+  sql = ''' INSERT INTO options_data(ticker, option_type, strike_price, expiration_date) VALUES(?,?,?,?)
+            ON CONFLICT(ticker, option_type, strike_price, expiration_date) DO NOTHING '''
 
   try:
     cursor = conn.cursor()
     cursor.execute(sql,(ticker, option_type, strike_price, expiration_date))
     conn.commit()
-    print(f"Added option: {ticker} {strike_price} {option_type}")
+    if cursor.rowcount:
+      print(f"Added option: {ticker} {strike_price} {option_type}")
+    else:
+      print(f"Option already exists: {ticker} {strike_price} {option_type}")
   except sqlite3.Error as e:
       print(f"Error adding option: {e}")
   finally:
@@ -108,11 +176,12 @@ def get_all_options():
             conn.close()
 
 
-def save_calculation_result(option_id, price, S, greeks):
-    """Saves a single calculation result to the database."""
+def save_calculation_result(option_id, price, S, greeks, sigma=None, r=None):
+    """Saves a single calculation result, and the inputs behind it, to the database."""
     conn = sqlite3.connect(DB_NAME)
-    sql = ''' INSERT INTO calculated_prices(option_id, theoretical_price, underlying_price, delta, gamma, vega, theta, rho)
-              VALUES(?,?,?,?,?,?,?,?) '''
+    sql = ''' INSERT INTO calculated_prices(option_id, theoretical_price, underlying_price, delta, gamma, vega, theta, rho,
+                                            volatility, risk_free_rate)
+              VALUES(?,?,?,?,?,?,?,?,?,?) '''
     try:
         cursor = conn.cursor()
         cursor.execute(sql, (
@@ -123,7 +192,9 @@ def save_calculation_result(option_id, price, S, greeks):
             greeks['gamma'],
             greeks['vega'],
             greeks['theta'],
-            greeks['rho']
+            greeks['rho'],
+            sigma,
+            r
         ))
         conn.commit()
     except sqlite3.Error as e:
@@ -133,6 +204,93 @@ def save_calculation_result(option_id, price, S, greeks):
             conn.close()
 
 
+# Column order of the rows passed to save_calculation_results
+CALCULATION_COLUMNS = (
+    'option_id', 'calculation_timestamp', 'theoretical_price', 'underlying_price',
+    'delta', 'gamma', 'vega', 'theta', 'rho', 'volatility', 'risk_free_rate', 'as_of_date'
+)
+
+
+def timestamp_upper_bound(end):
+    """
+    Makes an inclusive upper bound on calculation_timestamp cover whole days.
+
+    Timestamps are stored as 'YYYY-MM-DD HH:MM:SS', so a date-only bound
+    would compare below every run on that date.
+    """
+    end = str(end)
+    return f"{end} 23:59:59.999999" if len(end) == 10 else end
+
+
+def save_calculation_results(rows, batch_size=10_000):
+    """
+    Saves many calculation results in batched transactions on one connection.
+
+    Args:
+        rows: Iterable of tuples ordered like CALCULATION_COLUMNS.
+        batch_size: Rows written per transaction.
+
+    Returns:
+        The number of rows saved.
+    """
+    conn = sqlite3.connect(DB_NAME)
+    sql = f''' INSERT INTO calculated_prices({', '.join(CALCULATION_COLUMNS)})
+              VALUES({','.join('?' * len(CALCULATION_COLUMNS))}) '''
+    saved = 0
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with conn:
+                    conn.executemany(sql, batch)
+                saved += len(batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany(sql, batch)
+            saved += len(batch)
+    except sqlite3.Error as e:
+        print(f"Error saving calculations: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return saved
+
+
+def replace_backfilled_results(option_ids, start_date, end_date, rows):
+    """
+    Replaces the backfilled results for the given options between two as-of dates.
+
+    The delete and every insert run in one transaction, so if any row fails
+    the earlier backfill for the range is left in place.
+
+    Args:
+        option_ids: Options whose backfilled results are replaced.
+        start_date, end_date: Inclusive as-of date range (YYYY-MM-DD).
+        rows: Iterable of tuples ordered like CALCULATION_COLUMNS.
+
+    Returns:
+        The number of rows saved.
+    """
+    conn = sqlite3.connect(DB_NAME)
+    delete_sql = ''' DELETE FROM calculated_prices
+                     WHERE as_of_date BETWEEN ? AND ?
+                       AND option_id IN (SELECT value FROM json_each(?)) '''
+    insert_sql = f''' INSERT INTO calculated_prices({', '.join(CALCULATION_COLUMNS)})
+                     VALUES({','.join('?' * len(CALCULATION_COLUMNS))}) '''
+    try:
+        with conn:
+            conn.execute(delete_sql, (start_date, end_date, json.dumps([int(i) for i in option_ids])))
+            return conn.executemany(insert_sql, rows).rowcount
+    except sqlite3.Error as e:
+        print(f"Error saving backfilled results: {e}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+
 def get_portfolios():
     """Queries all portfolios from the database."""
     conn = sqlite3.connect(DB_NAME)
@@ -166,6 +324,16 @@ def create_portfolio(name, description=""):
         if conn:
             conn.close()
 
+# Callbacks run with the new row after add_position commits, so in-memory
+# views such as position_book.PositionBook can update incrementally.
+_position_listeners = []
+
+
+def register_position_listener(callback):
+    """Registers callback(position_dict) to be called for every added position."""
+    _position_listeners.append(callback)
+
+
 def add_position(portfolio_id, ticker, quantity, asset_type, strike_price=None, expiration_date=None):
     """Adds a new position to a specific portfolio."""
     conn = sqlite3.connect(DB_NAME)
@@ -176,6 +344,22 @@ def add_position(portfolio_id, ticker, quantity, asset_type, strike_price=None,
         cursor.execute(sql, (portfolio_id, ticker, quantity, asset_type, strike_price, expiration_date))
         conn.commit()
         print(f"Added {quantity} {ticker} {asset_type} to portfolio ID {portfolio_id}")
+
+        position = {
+            'id': cursor.lastrowid,
+            'portfolio_id': portfolio_id,
+            'ticker': ticker,
+            'quantity': quantity,
+            'asset_type': asset_type,
+            'strike_price': strike_price,
+            'expiration_date': expiration_date,
+        }
+        for listener in _position_listeners:
+            # The row is already committed; a failing view must not undo that
+            try:
+                listener(position)
+            except Exception as e:
+                print(f"Error notifying position listener: {e}")
         return cursor.lastrowid
     except sqlite3.Error as e:
         print(f"Error adding position: {e}")
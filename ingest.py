@@ -0,0 +1,196 @@
+import csv
+import sqlite3
+import time
+from datetime import date, datetime
+from functools import lru_cache
+import database
+from database import setup_database
+from market_data import get_coordinator
+
+BATCH_SIZE = 10_000
+
+UPSERT_SQL = ''' INSERT INTO options_data(ticker, option_type, strike_price, expiration_date) VALUES(?,?,?,?)
+                 ON CONFLICT(ticker, option_type, strike_price, expiration_date) DO NOTHING '''
+
+# Column names accepted in local chain files, mapped to the options_data columns
+COLUMN_ALIASES = {
+    'ticker': ['ticker', 'symbol', 'underlying'],
+    'option_type': ['option_type', 'type', 'right', 'call_put'],
+    'strike_price': ['strike_price', 'strike'],
+    'expiration_date': ['expiration_date', 'expiration', 'expiry', 'expiry_date'],
+}
+
+_TYPE_NAMES = {'call': 'call', 'c': 'call', 'put': 'put', 'p': 'put'}
+_DATE_FORMATS = ['%Y-%m-%d', '%Y%m%d', '%m/%d/%Y']
+
+
+def _parse_expiration(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return _parse_expiration_string(str(value).strip()[:10])
+
+
+# Chains repeat a handful of expiration dates across thousands of strikes
+@lru_cache(maxsize=4096)
+def _parse_expiration_string(value):
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised expiration date: {value}")
+
+
+def normalize_option(ticker, option_type, strike_price, expiration_date):
+    """
+    Normalizes one contract to the form stored in options_data.
+
+    Tickers are upper-cased, types become 'call'/'put', strikes are rounded
+    to 4 decimals and expirations become YYYY-MM-DD, so the same contract
+    from different sources maps to the same unique key.
+    """
+    option_type = _TYPE_NAMES.get(str(option_type).strip().lower())
+    if option_type is None:
+        raise ValueError("Option type must be 'call' or 'put'.")
+
+    strike_price = round(float(strike_price), 4)
+    if strike_price <= 0:
+        raise ValueError("Strike price must be positive")
+
+    return (str(ticker).strip().upper(), option_type, strike_price, _parse_expiration(expiration_date))
+
+
+def read_chain_file(path):
+    """Yields contracts from a local CSV option chain file."""
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        header = {name.strip().lower(): name for name in reader.fieldnames or []}
+
+        columns = {}
+        for column, aliases in COLUMN_ALIASES.items():
+            match = next((header[a] for a in aliases if a in header), None)
+            if match is None:
+                raise ValueError(f"Chain file {path} has no column for {column}.")
+            columns[column] = match
+
+        for row in reader:
+            yield tuple(row[columns[c]] for c in COLUMN_ALIASES)
+
+
+def fetch_option_chains(tickers):
+    """Yields every listed contract for the given tickers from Yahoo Finance."""
+    import yfinance as yf
+
+    coordinator = get_coordinator()
+    for ticker_symbol in tickers:
+        print(f"Fetching option chain for {ticker_symbol}...")
+        try:
+            ticker = yf.Ticker(ticker_symbol)
+            expirations = coordinator.fetch(('options', ticker_symbol), lambda: ticker.options)
+            for expiration in expirations:
+                chain = coordinator.fetch(('option_chain', ticker_symbol, expiration), ticker.option_chain, expiration)
+                for option_type, contracts in (('call', chain.calls), ('put', chain.puts)):
+                    for strike in contracts['strike']:
+                        yield (ticker_symbol, option_type, strike, expiration)
+        except Exception as e:
+            print(f"Could not fetch chain for {ticker_symbol}. Error: {e}. Skipping.")
+
+
+def prune_expired_options(conn, as_of=None):
+    """
+    Deletes contracts that expired before `as_of` (today by default).
+
+    Rows in calculated_prices are kept as price history.
+
+    Returns:
+        The number of contracts removed.
+    """
+    as_of = (as_of or date.today()).strftime('%Y-%m-%d')
+
+    cursor = conn.execute("DELETE FROM options_data WHERE expiration_date < ?", (as_of,))
+    return cursor.rowcount
+
+
+def ingest_option_chains(contracts, batch_size=BATCH_SIZE, prune=True, as_of=None):
+    """
+    Upserts contracts into options_data in batched transactions.
+
+    Args:
+        contracts: Iterable of (ticker, option_type, strike, expiration)
+            tuples, e.g. from read_chain_file() or fetch_option_chains().
+        batch_size: Contracts written per transaction.
+        prune: Whether to skip expired contracts and delete those already
+            stored, so daily reloads leave the table the same size.
+        as_of: Date used to decide which contracts have expired.
+
+    Returns:
+        A dictionary with row counts, elapsed seconds and rows per second.
+    """
+    setup_database()
+
+    as_of = as_of or date.today()
+    as_of_str = as_of.strftime('%Y-%m-%d')
+    stats = {'read': 0, 'inserted': 0, 'existing': 0, 'invalid': 0, 'expired': 0, 'pruned': 0}
+    start = time.perf_counter()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        def flush(batch):
+            with conn:
+                inserted = conn.executemany(UPSERT_SQL, batch).rowcount
+            stats['inserted'] += inserted
+            stats['existing'] += len(batch) - inserted
+
+        batch = []
+        for contract in contracts:
+            stats['read'] += 1
+            try:
+                option = normalize_option(*contract)
+            except (TypeError, ValueError) as e:
+                stats['invalid'] += 1
+                print(f"Skipping invalid contract {contract}: {e}")
+                continue
+
+            if prune and option[3] < as_of_str:
+                stats['expired'] += 1
+                continue
+            batch.append(option)
+
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        if prune:
+            with conn:
+                stats['pruned'] = prune_expired_options(conn, as_of)
+
+    except sqlite3.Error as e:
+        print(f"Error ingesting options: {e}")
+    finally:
+        conn.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['read'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+
+    print(f"Ingested {stats['read']} contracts in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s): {stats['inserted']} new, "
+          f"{stats['existing']} already present, {stats['invalid']} invalid, "
+          f"{stats['expired']} expired skipped, {stats['pruned']} expired contracts pruned.")
+    return stats
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python ingest.py <chain.csv | TICKER ...>")
+        sys.exit(1)
+
+    if sys.argv[1].endswith('.csv'):
+        ingest_option_chains(read_chain_file(sys.argv[1]))
+    else:
+        ingest_option_chains(fetch_option_chains(sys.argv[1:]))
@@ -1,23 +1,27 @@
-import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime
 from pricer import BlackScholesPricer
 from database import get_all_options, save_calculation_result, setup_database
+from market_data import get_coordinator
+
+
+# pandas is imported inside the functions that need it; it is slow to import
+# and most entry points never touch it. Market data goes through the shared
+# coordinator in market_data, which only imports yfinance when it fetches.
 
 
 def get_live_market_data(ticker_symbol):
   print(f"Fetching data for {ticker_symbol}...")
-  ticker = yf.Ticker(ticker_symbol)
+  coordinator = get_coordinator()
 
   # Get the most recent price
-  hist = ticker.history(period="1d")
+  hist = coordinator.history(ticker_symbol, period="1d")
   if hist.empty:
       raise ValueError(f"Could not get price for {ticker_symbol}. Is the ticker correct?")
   current_price = hist['Close'].iloc[0]
 
   # Get historical data for the last year to calculate volatility
-  hist_data = ticker.history(period="1y")
+  hist_data = coordinator.history(ticker_symbol, period="1y")
 
   # Calculate daily log returns
   log_returns = np.log(hist_data['Close'] / hist_data['Close'].shift(1))
@@ -51,7 +55,7 @@ def get_risk_free_rate(maturity_days):
     elif maturity_days <= 365:
         ticker = "^TNX"
 
-    rate_data = yf.Ticker(ticker).history(period="5d")
+    rate_data = get_coordinator().history(ticker, period="5d")
     return rate_data['Close'].iloc[-1] / 100
 
 
@@ -61,6 +65,8 @@ def run_calculations():
   Fetches options, gets live data, calculates
   prices/greeks, saves them, and returns a results DataFrame.
   """
+  import pandas as pd
+
   setup_database()
 
   # Set a single risk-free rate for all calculations
@@ -98,7 +104,7 @@ def run_calculations():
 
 
       print(f"  > Saving results for {ticker} option ID {option_id}...")
-      save_calculation_result(option_id, calculated_price, S, calculated_greeks)
+      save_calculation_result(option_id, calculated_price, S, calculated_greeks, sigma, RISK_FREE_RATE)
 
       result_row = {
           'Ticker': ticker,
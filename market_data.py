@@ -0,0 +1,195 @@
+"""
+Process-wide coordination of market data fetches.
+
+Every Streamlit session and batch worker in a process shares one
+FetchCoordinator. Concurrent requests for the same data share a single
+upstream call, and all upstream calls go through a token-bucket rate limiter
+with exponential backoff on failures.
+"""
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import Future
+
+# Outbound requests per second and the burst allowed above that rate
+REQUESTS_PER_SECOND = 5.0
+BURST = 10
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+
+class TokenBucket:
+    """A thread-safe token bucket; acquire() blocks until a token is free."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class YahooProvider:
+    """Fetches price history from Yahoo Finance."""
+
+    def history(self, ticker, **kwargs):
+        import yfinance as yf
+
+        return yf.Ticker(ticker).history(**kwargs)
+
+
+class FakeProvider:
+    """
+    An offline provider with deterministic prices, for tests and local runs.
+
+    Each ticker gets a reproducible random walk of business-day closes
+    (rate tickers such as ^TNX hover around 4%). Calls are counted per
+    ticker, and `latency` / `failures` simulate a slow or flaky upstream.
+    """
+
+    def __init__(self, latency=0.0, failures=0, volatility=0.25):
+        self.latency = latency
+        self.failures = failures
+        self.volatility = volatility
+        self.calls = Counter()
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _closes(self, ticker):
+        import numpy as np
+        import pandas as pd
+
+        if ticker not in self._series:
+            dates = pd.bdate_range('2015-01-01', pd.Timestamp.today().normalize())
+            rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+            if ticker.startswith('^'):
+                closes = 4.0 + np.cumsum(rng.normal(0, 0.02, len(dates))).clip(-3, 3)
+            else:
+                daily_vol = self.volatility / np.sqrt(252)
+                start = 20 + rng.random() * 300
+                closes = start * np.exp(np.cumsum(rng.normal(0, daily_vol, len(dates))))
+            self._series[ticker] = pd.DataFrame({'Close': closes}, index=dates)
+        return self._series[ticker]
+
+    def history(self, ticker, period=None, start=None, end=None, **kwargs):
+        import pandas as pd
+
+        with self._lock:
+            self.calls[ticker] += 1
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("Simulated upstream failure")
+            closes = self._closes(ticker)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if start is not None or end is not None:
+            return closes.loc[pd.Timestamp(start) if start else None:pd.Timestamp(end) if end else None]
+        days = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260}
+        return closes.iloc[-days.get(period or '1mo', 21):]
+
+
+class FetchCoordinator:
+    """
+    Shares in-flight fetches between threads and rate limits upstream calls.
+
+    fetch(key, func, ...) runs func at most once at a time per key: callers
+    that arrive while a fetch for the same key is running wait for it and
+    receive the same result (or exception). Results are not cached after
+    the fetch completes.
+    """
+
+    def __init__(self, provider=None, rate=REQUESTS_PER_SECOND, burst=BURST,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE_SECONDS,
+                 backoff_max=BACKOFF_MAX_SECONDS, sleep=time.sleep):
+        self.provider = provider or YahooProvider()
+        self.limiter = TokenBucket(rate, burst, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def fetch(self, key, func, *args, **kwargs):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats['fetches'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._call_with_retries(func, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def _call_with_retries(self, func, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            with self._lock:
+                self.stats['upstream_calls'] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.stats['retries'] += 1
+                # Exponential backoff with full jitter
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                self._sleep(random.uniform(0, delay))
+
+    def history(self, ticker, **kwargs):
+        """Price history for a ticker, as returned by the provider."""
+        key = ('history', ticker, tuple(sorted(kwargs.items())))
+        return self.fetch(key, self.provider.history, ticker, **kwargs)
+
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def get_coordinator():
+    """Returns the process-wide coordinator, creating it on first use."""
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            _coordinator = FetchCoordinator()
+        return _coordinator
+
+
+def set_coordinator(coordinator):
+    """Replaces the process-wide coordinator, e.g. with one using FakeProvider."""
+    global _coordinator
+    with _coordinator_lock:
+        _coordinator = coordinator
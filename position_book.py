@@ -0,0 +1,276 @@
+"""
+A compact, array-backed view of the positions table.
+
+PositionBook keeps one typed NumPy array per column instead of a dict per
+position. Column properties return views of the underlying buffers, so
+vectorized pricers such as pricer.black_scholes_vectorized can consume them
+without copying.
+"""
+import sqlite3
+import threading
+from datetime import date
+import numpy as np
+import database
+from database import setup_database, register_position_listener
+
+ASSET_TYPE_CODES = {'stock': 0, 'call': 1, 'put': 2}
+ASSET_TYPES = ['stock', 'call', 'put']
+
+# date.toordinal() of 1970-01-01, to convert ordinals to datetime64 days
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NAT_KEY = np.datetime64('NaT', 'M').astype(np.int64)
+
+_COLUMNS = {
+    'id': np.int64,
+    'portfolio_id': np.int64,
+    'ticker_code': np.int32,
+    'quantity': np.int64,
+    'type_code': np.int8,
+    'strike': np.float64,
+    'expiry_ordinal': np.int32,
+}
+
+
+class PositionBook:
+    """
+    Positions stored as a struct of arrays with group indexes.
+
+    Stocks have a NaN strike and an expiry ordinal of 0. Tickers are stored
+    as integer codes into `tickers`. Group indexes by ticker and by expiry
+    month are built on first use and rebuilt only after the book changes.
+    """
+
+    def __init__(self, portfolio_id=None, capacity=64):
+        self.portfolio_id = portfolio_id
+        self.tickers = []
+        self._ticker_codes = {}
+        self._arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._size = 0
+        self._groups = {}
+        self._lock = threading.Lock()
+        # Incremented on every change, so callers can cache derived results
+        self.version = 0
+
+    @classmethod
+    def from_database(cls, portfolio_id=None):
+        """Loads all positions (or one portfolio's) with a single query."""
+        setup_database()
+
+        sql = "SELECT id, portfolio_id, ticker, quantity, asset_type, strike_price, expiration_date FROM positions"
+        params = ()
+        if portfolio_id is not None:
+            sql += " WHERE portfolio_id = ?"
+            params = (portfolio_id,)
+
+        conn = sqlite3.connect(database.DB_NAME)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error fetching positions: {e}")
+            rows = []
+        finally:
+            conn.close()
+
+        book = cls(portfolio_id, capacity=max(len(rows), 64))
+        book._append_rows(rows)
+        return book
+
+    def __len__(self):
+        return self._size
+
+    def _column(self, name):
+        return self._arrays[name][:self._size]
+
+    @property
+    def ids(self):
+        return self._column('id')
+
+    @property
+    def portfolio_ids(self):
+        return self._column('portfolio_id')
+
+    @property
+    def ticker_code(self):
+        return self._column('ticker_code')
+
+    @property
+    def quantity(self):
+        return self._column('quantity')
+
+    @property
+    def type_code(self):
+        return self._column('type_code')
+
+    @property
+    def strike(self):
+        return self._column('strike')
+
+    @property
+    def expiry_ordinal(self):
+        return self._column('expiry_ordinal')
+
+    def _code_for(self, ticker):
+        code = self._ticker_codes.get(ticker)
+        if code is None:
+            code = len(self.tickers)
+            self._ticker_codes[ticker] = code
+            self.tickers.append(ticker)
+        return code
+
+    def _append_rows(self, rows):
+        """
+        Appends (id, portfolio_id, ticker, quantity, asset_type, strike, expiry)
+        tuples, skipping ids the book already holds.
+        """
+        with self._lock:
+            if self._size and rows:
+                held = np.isin([row[0] for row in rows], self.ids)
+                rows = [row for row, skip in zip(rows, held) if not skip]
+                if not rows:
+                    return
+            needed = self._size + len(rows)
+            capacity = len(self._arrays['id'])
+            if needed > capacity:
+                # Grow geometrically so repeated appends stay amortized O(1)
+                capacity = max(needed, capacity * 2)
+                for name, array in self._arrays.items():
+                    grown = np.empty(capacity, dtype=array.dtype)
+                    grown[:self._size] = array[:self._size]
+                    self._arrays[name] = grown
+
+            end = self._size + len(rows)
+            if rows:
+                ids, portfolio_ids, tickers, quantities, asset_types, strikes, expirations = zip(*rows)
+                target = slice(self._size, end)
+                self._arrays['id'][target] = ids
+                self._arrays['portfolio_id'][target] = portfolio_ids
+                self._arrays['ticker_code'][target] = [self._code_for(t) for t in tickers]
+                self._arrays['quantity'][target] = quantities
+                self._arrays['type_code'][target] = [ASSET_TYPE_CODES[a] for a in asset_types]
+                self._arrays['strike'][target] = [np.nan if k is None else k for k in strikes]
+                # Books repeat a few expiry dates many times; parse each once
+                ordinals = {e: date.fromisoformat(e).toordinal() for e in set(expirations) if e}
+                self._arrays['expiry_ordinal'][target] = [ordinals.get(e, 0) for e in expirations]
+
+            self._size = end
+            self._groups = {}
+            self.version += 1
+
+    def add(self, position):
+        """Applies one position dict, as passed to position listeners."""
+        if self.portfolio_id is not None and position['portfolio_id'] != self.portfolio_id:
+            return
+        self._append_rows([(
+            position['id'], position['portfolio_id'], position['ticker'], position['quantity'],
+            position['asset_type'], position['strike_price'], position['expiration_date']
+        )])
+
+    def watch(self):
+        """Keeps this book up to date with positions added through database.add_position."""
+        register_position_listener(self.add)
+        return self
+
+    def _group_index(self, name, keys):
+        """Returns {key: row indexes}, with the indexes as views of one sorted array."""
+        if name not in self._groups:
+            order = np.argsort(keys, kind='stable')
+            unique_keys, starts = np.unique(keys[order], return_index=True)
+            self._groups[name] = dict(zip(unique_keys.tolist(), np.split(order, starts[1:])))
+        return self._groups[name]
+
+    def by_ticker(self):
+        """Row indexes of the positions in each underlying, keyed by ticker."""
+        groups = self._group_index('ticker', self.ticker_code)
+        return {self.tickers[code]: rows for code, rows in groups.items()}
+
+    def by_expiry_month(self):
+        """Row indexes of option positions keyed by expiry month (YYYY-MM)."""
+        keys = self.expiry_months().astype(np.int64)
+        groups = self._group_index('expiry_month', keys)
+        return {
+            str(np.datetime64(month, 'M')): rows
+            for month, rows in groups.items() if month != _NAT_KEY
+        }
+
+    def expiry_months(self):
+        """Expiry month of each position as datetime64[M] (NaT for stocks)."""
+        days = (self.expiry_ordinal.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+        return np.where(self.type_code == 0, np.datetime64('NaT', 'M'), days.astype('datetime64[M]'))
+
+    def is_option(self):
+        return self.type_code != 0
+
+    def is_call(self):
+        return self.type_code == 1
+
+    def time_to_expiration(self, as_of=None):
+        """Years to expiry from `as_of` (today by default), same convention as main.py; 0 for stocks."""
+        as_of = (as_of or date.today()).toordinal()
+        years = (self.expiry_ordinal.astype(np.float64) - as_of) / 365.25
+        return np.where(self.is_option(), years, 0.0)
+
+    def to_frame(self):
+        """The positions as a pandas DataFrame shaped like the positions table, ordered by ticker."""
+        import pandas as pd
+
+        days = (self.expiry_ordinal.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+        expirations = np.where(self.is_option(), np.datetime_as_string(days), None)
+        return pd.DataFrame({
+            'ticker': np.array(self.tickers, dtype=object)[self.ticker_code],
+            'quantity': self.quantity,
+            'asset_type': np.array(ASSET_TYPES, dtype=object)[self.type_code],
+            'strike_price': self.strike,
+            'expiration_date': expirations,
+        }, index=pd.Index(self.ids, name='id')).sort_values('ticker', kind='stable')
+
+
+_books = {}
+_books_lock = threading.Lock()
+_listening = False
+
+
+def _dispatch(position):
+    # Under the same lock as reloads, so a row is never both loaded and appended
+    with _books_lock:
+        for book in _books.values():
+            book.add(position)
+
+
+def _fingerprint(portfolio_id):
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM positions WHERE portfolio_id = ?", (portfolio_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def get_position_book(portfolio_id):
+    """
+    Returns the shared, incrementally updated book for a portfolio.
+
+    Books are loaded once per process. Positions added through add_position
+    in this process are applied in place; if the table was changed from
+    elsewhere (the row count or last id no longer match) the book is reloaded.
+    """
+    global _listening
+
+    setup_database()
+    with _books_lock:
+        if not _listening:
+            register_position_listener(_dispatch)
+            _listening = True
+
+        book = _books.get(portfolio_id)
+        if book is not None:
+            last_id = int(book.ids.max()) if len(book) else 0
+            if _fingerprint(portfolio_id) == (len(book), last_id):
+                return book
+
+        reloaded = PositionBook.from_database(portfolio_id)
+        if book is not None:
+            # Keep versions increasing so caches keyed on them stay valid
+            reloaded.version = book.version + 1
+        _books[portfolio_id] = reloaded
+        return reloaded
@@ -1,5 +1,11 @@
 import numpy as np
-from scipy.stats import norm
+# scipy.special is a fraction of the import cost of scipy.stats and provides
+# the same standard normal CDF.
+from scipy.special import ndtr
+
+
+def _norm_pdf(x):
+  return np.exp(-0.5 * x**2) / np.sqrt(2 * np.pi)
 
 
 class BlackScholesPricer:
@@ -23,11 +29,11 @@ class BlackScholesPricer:
 
   def _calculate_all_values(self):
     self._calculate_d1_d2()
-    self.n_d1 = norm.cdf(self.d1)
-    self.n_d2 = norm.cdf(self.d2)
-    self.n_neg_d1 = norm.cdf(-self.d1)
-    self.n_neg_d2 = norm.cdf(-self.d2)
-    self.pdf_d1 = norm.pdf(self.d1)
+    self.n_d1 = ndtr(self.d1)
+    self.n_d2 = ndtr(self.d2)
+    self.n_neg_d1 = ndtr(-self.d1)
+    self.n_neg_d2 = ndtr(-self.d2)
+    self.pdf_d1 = _norm_pdf(self.d1)
 
   def _calculate_d1_d2(self):
     T_safe = max(self.T, 1e-8)
@@ -82,7 +88,7 @@ class BlackScholesPricer:
     if self.option_type == 'call':
       rho = self.K * self.T * np.exp(-self.r * self.T) * self.n_d2
     elif self.option_type == 'put':
-      rho = -self.K * self.T * np.exp(-self.r * self.T) * self.n_neg_d1
+      rho = -self.K * self.T * np.exp(-self.r * self.T) * self.n_neg_d2
     else:
       raise ValueError("Option type must be 'call or 'put'.")
 
@@ -97,3 +103,56 @@ class BlackScholesPricer:
             'theta': self.theta(),
             'rho': self.rho()
         }
+
+
+def black_scholes_vectorized(S, K, T, r, sigma, is_call, greeks=True):
+  """
+  Prices many options at once with the same formulas as BlackScholesPricer.
+
+  All arguments may be NumPy arrays and are broadcast against each other;
+  `is_call` is a boolean array (False means put). Options with T <= 0 are
+  valued at intrinsic value with zero Greeks (delta is the exercise
+  indicator). With greeks=False only the price is computed.
+
+  Returns:
+      A dictionary of arrays: price, delta, gamma, vega, theta and rho.
+  """
+  S, K, T, r, sigma = (np.asarray(x, dtype=np.float64) for x in (S, K, T, r, sigma))
+  is_call = np.asarray(is_call, dtype=bool)
+
+  alive = T > 0
+  T_safe = np.maximum(T, 1e-8)
+  sqrt_T = np.sqrt(T_safe)
+  sigma_sqrt_T = sigma * sqrt_T
+
+  d1 = (np.log(S / K) + (r + sigma**2 / 2) * T_safe) / sigma_sqrt_T
+  d2 = d1 - sigma_sqrt_T
+  discount = np.exp(-r * T_safe)
+
+  # Sign flips turn the call formulas into the put formulas
+  sign = np.where(is_call, 1.0, -1.0)
+  n_d1 = ndtr(sign * d1)
+  n_d2 = ndtr(sign * d2)
+
+  price = sign * (S * n_d1 - K * discount * n_d2)
+  intrinsic = np.maximum(sign * (S - K), 0.0)
+  if not greeks:
+    return {'price': np.where(alive, price, intrinsic)}
+
+  pdf_d1 = _norm_pdf(d1)
+  delta = sign * n_d1
+  gamma = pdf_d1 / (S * sigma_sqrt_T)
+  vega = S * pdf_d1 * sqrt_T
+  theta = -S * pdf_d1 * sigma / (2 * sqrt_T) - sign * r * K * discount * n_d2
+  rho = sign * K * T_safe * discount * n_d2
+
+  exercised = np.where(intrinsic > 0, sign, 0.0)
+
+  return {
+      'price': np.where(alive, price, intrinsic),
+      'delta': np.where(alive, delta, exercised),
+      'gamma': np.where(alive, gamma, 0.0),
+      'vega': np.where(alive, vega, 0.0),
+      'theta': np.where(alive, theta, 0.0),
+      'rho': np.where(alive, rho, 0.0),
+  }
@@ -0,0 +1,290 @@
+"""
+A long-running local pricing service.
+
+Serves Black-Scholes prices, Greeks and implied volatilities over HTTP (or a
+Unix socket) using only asyncio. Single-option requests that arrive within a
+short window are collected into one micro-batch and evaluated in a single
+vectorized pass.
+
+    python pricing_service.py --port 8765
+    curl -X POST localhost:8765/price -d '{"S": 100, "K": 105, "T": 0.5, "r": 0.04, "sigma": 0.2, "option_type": "call"}'
+
+Endpoints: POST /price, /greeks, /iv; GET /stats, /health.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+import numpy as np
+from pricer import black_scholes_vectorized
+from analysis import implied_volatility_vectorized
+
+BATCH_WINDOW_SECONDS = 0.002
+MAX_BATCH_SIZE = 4096
+# Latency and batch-size samples kept for /stats
+STATS_WINDOW = 100_000
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _parse_request(kind, body):
+    """Validates a request body into a tuple of floats, as BlackScholesPricer would."""
+    try:
+        option_type = str(body.get('option_type', 'call')).lower()
+        if option_type not in ('call', 'put'):
+            raise ValueError("Option type must be 'call or 'put'.")
+        S, K, T, r = (float(body[name]) for name in ('S', 'K', 'T', 'r'))
+        last = float(body['market_price'] if kind == 'iv' else body['sigma'])
+    except KeyError as e:
+        raise ValueError(f"Missing field: {e.args[0]}")
+    except (TypeError, AttributeError):
+        raise ValueError("Request body must be a JSON object of numbers")
+
+    if not all(math.isfinite(v) for v in (S, K, T, r, last)):
+        raise ValueError("Inputs must be finite numbers")
+    if S <= 0:
+        raise ValueError("Stock price must be positive")
+    if K <= 0:
+        raise ValueError("Strike price must be positive")
+    if T <= 0:
+        raise ValueError("Time to expiration must be positive")
+    if kind != 'iv' and last <= 0:
+        raise ValueError("Volatility must be positive")
+
+    return (S, K, T, r, last, option_type == 'call')
+
+
+def _percentile(samples, q):
+    return float(np.percentile(np.fromiter(samples, dtype=np.float64), q)) if samples else None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests and evaluates them together.
+
+    The first request of a batch starts a timer of `window` seconds (or the
+    batch fills up to `max_batch_size`); everything queued by then is priced
+    with one call to black_scholes_vectorized and, for IV requests, one call
+    to implied_volatility_vectorized.
+    """
+
+    def __init__(self, window=BATCH_WINDOW_SECONDS, max_batch_size=MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = deque(maxlen=STATS_WINDOW)
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, kind, params):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((kind, params, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Drain anything already queued without waiting further
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self.batch_sizes.append(len(batch))
+            try:
+                self._evaluate(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _evaluate(self, batch):
+        pricing = [item for item in batch if item[0] != 'iv']
+        iv = [item for item in batch if item[0] == 'iv']
+
+        if pricing:
+            S, K, T, r, sigma, is_call = np.array([params for _, params, _ in pricing]).T
+            values = black_scholes_vectorized(S, K, T, r, sigma, is_call.astype(bool))
+            for i, (kind, _, future) in enumerate(pricing):
+                if kind == 'price':
+                    result = {'price': float(values['price'][i])}
+                else:
+                    result = {name: float(values[name][i]) for name in values}
+                if not future.cancelled():
+                    future.set_result(result)
+
+        if iv:
+            S, K, T, r, market_price, is_call = np.array([params for _, params, _ in iv]).T
+            sigma = implied_volatility_vectorized(market_price, S, K, T, r, is_call.astype(bool))
+            for i, (_, _, future) in enumerate(iv):
+                value = float(sigma[i])
+                if not future.cancelled():
+                    future.set_result({'implied_volatility': None if np.isnan(value) else value})
+
+
+class PricingService:
+    """The HTTP front end: parses requests, hands them to the batcher and records latency."""
+
+    def __init__(self, window=BATCH_WINDOW_SECONDS, max_batch_size=MAX_BATCH_SIZE):
+        self.batcher = MicroBatcher(window, max_batch_size)
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        # Warm up NumPy/SciPy before the first real request
+        black_scholes_vectorized(100.0, 100.0, 1.0, 0.05, 0.2, True)
+        implied_volatility_vectorized(10.0, 100.0, 100.0, 1.0, 0.05, True)
+
+        self.batcher.start()
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    def stats(self):
+        batch_sizes = self.batcher.batch_sizes
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'uptime_seconds': time.time() - self.started,
+            'latency_ms': {
+                f'p{q}': _percentile(self.latencies, q) * 1000 if self.latencies else None
+                for q in (50, 90, 95, 99)
+            },
+            'batches': len(batch_sizes),
+            'batch_size': {
+                'mean': float(np.mean(batch_sizes)) if batch_sizes else None,
+                'p50': _percentile(batch_sizes, 50),
+                'p99': _percentile(batch_sizes, 99),
+                'max': max(batch_sizes) if batch_sizes else None,
+            },
+        }
+
+    async def _route(self, method, path, body):
+        kind = path.strip('/')
+        if method == 'GET' and kind == 'health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and kind == 'stats':
+            return 200, self.stats()
+        if kind not in ('price', 'greeks', 'iv'):
+            return 404, {'error': f"Unknown endpoint {path}"}
+        if method != 'POST':
+            return 405, {'error': f"Use POST for {path}"}
+
+        try:
+            params = _parse_request(kind, json.loads(body or b'{}'))
+        except (ValueError, json.JSONDecodeError) as e:
+            return 400, {'error': str(e)}
+        return 200, await self.batcher.submit(kind, params)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                received = time.perf_counter()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                request = request_line.decode('latin-1').split()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+
+                # For a malformed request the body length is unknown, so the
+                # connection is closed after the 400 rather than resynchronised
+                if len(request) != 3:
+                    status, payload, keep_alive = 400, {'error': "Malformed request line"}, False
+                elif length < 0:
+                    status, payload, keep_alive = 400, {'error': "Invalid Content-Length"}, False
+                else:
+                    body = await reader.readexactly(length)
+                    method, path, _ = request
+                    try:
+                        status, payload = await self._route(method, path.split('?')[0], body)
+                    except Exception as e:
+                        status, payload = 500, {'error': str(e)}
+
+                self.requests += 1
+                if status == 200:
+                    self.latencies.append(time.perf_counter() - received)
+                else:
+                    self.errors += 1
+
+                content = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + content
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host='127.0.0.1', port=8765, unix_path=None, window=BATCH_WINDOW_SECONDS):
+    service = PricingService(window=window)
+    server = await service.start(host, port, unix_path)
+    where = unix_path or f"http://{host}:{port}"
+    print(f"Pricing service listening on {where} (batch window {window * 1000:.1f} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local Black-Scholes pricing service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW_SECONDS * 1000)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.window_ms / 1000))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,249 @@
+"""
+A daemon that keeps the option book continuously revalued.
+
+Unlike run_calculations, which starts from nothing on every cron run, the
+scheduler keeps market data, the risk-free rate and the option book in
+memory. Each cycle refreshes only the inputs that are due, reprices only the
+options whose inputs were refreshed, and writes the results to
+calculated_prices in batched commits.
+
+    python scheduler.py --interval AAPL=60 --default-interval 300
+    python scheduler.py --fake --tick 1       # offline, with FakeProvider
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from pricer import black_scholes_vectorized
+from database import setup_database, get_all_options, save_calculation_results
+from main import get_live_market_data, get_risk_free_rate
+
+DEFAULT_REFRESH_SECONDS = 300
+RATE_REFRESH_SECONDS = 3600
+BOOK_REFRESH_SECONDS = 600
+TICK_SECONDS = 5
+FETCH_WORKERS = 8
+# Cycle latencies kept for metrics
+METRICS_WINDOW = 1000
+
+
+class RevaluationScheduler:
+    """
+    Refreshes inputs on per-ticker intervals and reprices affected options.
+
+    A cycle reloads options_data when due (new contracts are priced right
+    away), refreshes the rate when due (which reprices everything) and
+    refreshes every ticker whose interval has elapsed. Cycles never overlap:
+    a cycle that starts while another is running is skipped and counted.
+    """
+
+    def __init__(self, refresh_intervals=None, default_interval=DEFAULT_REFRESH_SECONDS,
+                 rate_interval=RATE_REFRESH_SECONDS, book_interval=BOOK_REFRESH_SECONDS,
+                 fetch_workers=FETCH_WORKERS, clock=time.time):
+        self.refresh_intervals = dict(refresh_intervals or {})
+        self.default_interval = default_interval
+        self.rate_interval = rate_interval
+        self.book_interval = book_interval
+        self._clock = clock
+
+        self.market = {}
+        self.rate = None
+        self.rate_updated = None
+        self.book = {}
+        self.book_updated = None
+
+        self._executor = ThreadPoolExecutor(max_workers=fetch_workers)
+        self._cycle_lock = threading.Lock()
+        # Guards skipped_cycles, which is updated by threads that did not get _cycle_lock
+        self._skipped_lock = threading.Lock()
+        self.cycle_seconds = deque(maxlen=METRICS_WINDOW)
+        self.counters = {'cycles': 0, 'skipped_cycles': 0, 'results_written': 0, 'refresh_errors': 0}
+
+    def _interval(self, ticker):
+        return self.refresh_intervals.get(ticker, self.default_interval)
+
+    def _load_book(self):
+        """Reloads options_data; returns the tickers whose contracts changed."""
+        by_ticker = {}
+        for option in get_all_options():
+            by_ticker.setdefault(option['ticker'], []).append(option)
+
+        changed = set()
+        book = {}
+        for ticker, options in by_ticker.items():
+            ids = np.array([o['id'] for o in options])
+            previous = self.book.get(ticker)
+            if previous is None or not np.array_equal(previous['ids'], ids):
+                changed.add(ticker)
+            book[ticker] = {
+                'ids': ids,
+                'strike': np.array([o['strike_price'] for o in options], dtype=np.float64),
+                'is_call': np.array([o['option_type'].lower() == 'call' for o in options]),
+                'expiry_ordinal': np.array(
+                    [datetime.strptime(o['expiration_date'], '%Y-%m-%d').toordinal() for o in options]
+                ),
+            }
+
+        self.book = book
+        self.book_updated = self._clock()
+        return changed
+
+    def _reprice(self, tickers, now):
+        """Prices every option of the given tickers in one pass per ticker."""
+        # Same convention as calculate_time_to_expiration: whole days from now / 365.25
+        local_now = datetime.fromtimestamp(now)
+        past_midnight = 1 if local_now.time() != datetime.min.time() else 0
+        timestamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        rows = []
+        for ticker in tickers:
+            options = self.book.get(ticker)
+            market = self.market.get(ticker)
+            if options is None or market is None:
+                continue
+
+            days = options['expiry_ordinal'] - local_now.toordinal() - past_midnight
+            T = np.maximum(days / 365.25, 1e-12)
+            S, sigma = market['price'], market['volatility']
+            values = black_scholes_vectorized(S, options['strike'], T, self.rate, sigma, options['is_call'])
+
+            rows.extend(zip(
+                options['ids'].tolist(),
+                [timestamp] * len(T),
+                values['price'].tolist(),
+                [S] * len(T),
+                values['delta'].tolist(),
+                values['gamma'].tolist(),
+                values['vega'].tolist(),
+                values['theta'].tolist(),
+                values['rho'].tolist(),
+                [sigma] * len(T),
+                [self.rate] * len(T),
+                [None] * len(T),
+            ))
+
+        return save_calculation_results(rows) if rows else 0
+
+    @staticmethod
+    def _fetch_market_data(ticker):
+        try:
+            return get_live_market_data(ticker)
+        except Exception as e:
+            print(f"Could not process {ticker}. Error: {e}. Skipping.")
+            return None
+
+    def run_cycle(self):
+        """
+        Runs one refresh-and-reprice cycle.
+
+        Returns:
+            The number of results written, or None if another cycle was
+            still running.
+        """
+        if not self._cycle_lock.acquire(blocking=False):
+            with self._skipped_lock:
+                self.counters['skipped_cycles'] += 1
+            return None
+
+        try:
+            start = time.perf_counter()
+            now = self._clock()
+            affected = set()
+
+            if self.book_updated is None or now - self.book_updated >= self.book_interval:
+                affected |= self._load_book()
+
+            if self.rate_updated is None or now - self.rate_updated >= self.rate_interval:
+                try:
+                    rate = get_risk_free_rate(maturity_days=365)
+                    if rate != self.rate:
+                        affected |= set(self.book)
+                    self.rate, self.rate_updated = rate, now
+                except Exception as e:
+                    self.counters['refresh_errors'] += 1
+                    print(f"Could not refresh risk-free rate. Error: {e}")
+
+            due = [
+                ticker for ticker in self.book
+                if ticker not in self.market or now - self.market[ticker]['updated'] >= self._interval(ticker)
+            ]
+            # Fetches run concurrently; the shared coordinator rate limits them
+            for ticker, data in zip(due, self._executor.map(self._fetch_market_data, due)):
+                if data is None:
+                    self.counters['refresh_errors'] += 1
+                    continue
+                self.market[ticker] = {'price': float(data['price']), 'volatility': float(data['volatility']), 'updated': now}
+                affected.add(ticker)
+
+            written = self._reprice(sorted(affected), now) if self.rate is not None else 0
+
+            self.counters['cycles'] += 1
+            self.counters['results_written'] += written
+            self.cycle_seconds.append(time.perf_counter() - start)
+            if affected:
+                print(f"Cycle {self.counters['cycles']}: repriced {written} options on "
+                      f"{len(affected)} tickers in {self.cycle_seconds[-1]:.2f}s")
+            return written
+        finally:
+            self._cycle_lock.release()
+
+    def metrics(self):
+        """Cycle latency, input staleness (seconds since refresh) and counters."""
+        now = self._clock()
+        latencies = np.array(self.cycle_seconds) if self.cycle_seconds else None
+        return {
+            **self.counters,
+            'cycle_seconds': None if latencies is None else {
+                'last': float(latencies[-1]),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'max': float(latencies.max()),
+            },
+            'staleness_seconds': {ticker: now - m['updated'] for ticker, m in self.market.items()},
+            'rate_staleness_seconds': None if self.rate_updated is None else now - self.rate_updated,
+            'book_staleness_seconds': None if self.book_updated is None else now - self.book_updated,
+        }
+
+    def run_forever(self, tick_seconds=TICK_SECONDS, stop_event=None):
+        """
+        Starts a cycle every tick in a worker thread until stop_event is set.
+
+        A tick that arrives while the previous cycle is still running is
+        skipped rather than queued.
+        """
+        setup_database()
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            threading.Thread(target=self.run_cycle, daemon=True).start()
+            stop_event.wait(tick_seconds)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Continuously revalue the option book")
+    parser.add_argument('--interval', action='append', default=[], metavar='TICKER=SECONDS',
+                        help="Refresh interval for one ticker (repeatable)")
+    parser.add_argument('--default-interval', type=float, default=DEFAULT_REFRESH_SECONDS)
+    parser.add_argument('--rate-interval', type=float, default=RATE_REFRESH_SECONDS)
+    parser.add_argument('--book-interval', type=float, default=BOOK_REFRESH_SECONDS)
+    parser.add_argument('--tick', type=float, default=TICK_SECONDS)
+    parser.add_argument('--fake', action='store_true', help="Use the offline FakeProvider for market data")
+    args = parser.parse_args()
+
+    if args.fake:
+        from market_data import FakeProvider, FetchCoordinator, set_coordinator
+        set_coordinator(FetchCoordinator(FakeProvider()))
+
+    intervals = {}
+    for item in args.interval:
+        ticker, _, seconds = item.partition('=')
+        intervals[ticker.upper()] = float(seconds)
+
+    scheduler = RevaluationScheduler(intervals, args.default_interval, args.rate_interval, args.book_interval)
+    try:
+        scheduler.run_forever(args.tick)
+    except KeyboardInterrupt:
+        print(scheduler.metrics())